@@ -3,10 +3,19 @@ alignment.py - JiWER 기반 정렬 및 메트릭 처리 모듈 (관대한 비교
 """
 from dataclasses import dataclass
 from enum import Enum
-from typing import List, Tuple
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import logging
 import re
+import time
 import jiwer
 
+try:
+    # jiwer>=4 의존성으로 함께 설치됨 (C++ 비트 병렬 구현)
+    from rapidfuzz.distance import Levenshtein as _rf_levenshtein
+except Exception:
+    _rf_levenshtein = None
+
 
 class AlignType(Enum):
     HIT = "hit"           # 정확히 일치
@@ -16,14 +25,14 @@ class AlignType(Enum):
     PENDING = "pending"   # 아직 말하지 않은 부분
 
 
-@dataclass 
+@dataclass(slots=True)
 class AlignedToken:
     """정렬된 토큰 정보"""
     text: str
     align_type: AlignType
     
     
-@dataclass
+@dataclass(slots=True)
 class PartialMetrics:
     """부분 평가 메트릭 (Trailing Deletion 제외)"""
     wer: float
@@ -33,6 +42,33 @@ class PartialMetrics:
     deletions: int
     insertions: int
     ref_processed: int  # 처리된 reference 토큰 수
+    has_pending: bool = False  # 아직 말하지 않은(PENDING) 토큰이 남아 있는지
+
+
+logger = logging.getLogger(__name__)
+
+# 반복되는 경고는 일정 간격으로만 출력 (스트리밍 중 매 호출 로그 방지)
+_WARN_INTERVAL_SEC = 60.0
+_last_warn_at = -_WARN_INTERVAL_SEC
+
+
+def _warn_throttled(msg: str) -> None:
+    global _last_warn_at
+    now = time.monotonic()
+    if now - _last_warn_at >= _WARN_INTERVAL_SEC:
+        _last_warn_at = now
+        logger.warning(msg)
+
+
+# 문자 상태 코드 (정렬 커널 내부 표현 - 문자당 1바이트, bytearray에 저장)
+_PENDING, _HIT, _SUB, _DEL = 0, 1, 2, 3
+# 연속 일치 구간 건너뛰기: _RUN_STREAK 문자 연속 일치 후 _RUN_BLOCK 단위로 비교
+_RUN_STREAK = 4
+_RUN_BLOCK = 16
+_HIT_BLOCK = bytes((_HIT,)) * _RUN_BLOCK
+_DEL_BYTE = bytes((_DEL,))
+_STATE_NAMES = ('pending', 'hit', 'sub', 'del')
+_CODE_ALIGN_TYPES = (AlignType.PENDING, AlignType.HIT, AlignType.SUB, AlignType.DEL)
 
 
 # ============ 한국어 숫자 변환 ============
@@ -61,6 +97,22 @@ KO_UNITS = {
     '조': 1000000000000,
 }
 
+# korean_to_number 조회 테이블
+# - 두 글자 숫자 단어(하나, 다섯, ...)는 별도 dict로 먼저 확인
+# - 한 글자는 숫자/단위를 하나의 dict로 합쳐 (단위 여부, 값)으로 조회
+_KO_TWO_CHAR = {k: v for k, v in KO_DIGITS.items() if len(k) == 2}
+_KO_ONE_CHAR = {
+    **{k: (False, v) for k, v in KO_DIGITS.items() if len(k) == 1},
+    **{k: (True, v) for k, v in KO_UNITS.items()},
+}
+
+# 한국어 숫자 단어를 이루는 문자 집합 (두 글자 단어의 각 글자 포함)
+_KO_NUM_CHARS = frozenset(''.join(list(KO_DIGITS) + list(KO_UNITS)))
+
+# 연속된 한국어 숫자 단어 패턴 (모듈 로드 시 한 번만 컴파일)
+_KO_NUM_RE = re.compile(f'[{re.escape("".join(sorted(_KO_NUM_CHARS)))}]+')
+
+@lru_cache(maxsize=4096)
 def korean_to_number(text: str) -> str:
     """
     한국어 숫자를 아라비아 숫자로 변환
@@ -74,68 +126,63 @@ def korean_to_number(text: str) -> str:
     if text.isdigit():
         return text
     
-    # 한국어 숫자가 포함되어 있는지 확인
-    has_korean_num = any(c in text for c in list(KO_DIGITS.keys()) + list(KO_UNITS.keys()))
-    if not has_korean_num:
+    # 한국어 숫자가 포함되어 있는지 확인 (frozenset.isdisjoint - C 레벨)
+    # 숫자 단어 글자가 하나도 없으면 변환될 수 없으므로 원본 반환
+    if _KO_NUM_CHARS.isdisjoint(text):
         return text
     
-    try:
-        result = 0
-        current = 0
-        temp = 0
-        
-        i = 0
-        while i < len(text):
-            matched = False
-            
-            # 긴 단어부터 매칭 시도 (하나, 둘, 셋 등)
-            for length in [2, 1]:
-                if i + length <= len(text):
-                    chunk = text[i:i+length]
-                    
-                    if chunk in KO_DIGITS:
-                        temp = KO_DIGITS[chunk]
-                        i += length
-                        matched = True
-                        break
-                    elif chunk in KO_UNITS:
-                        unit = KO_UNITS[chunk]
-                        if temp == 0:
-                            temp = 1
-                        
-                        if unit >= 10000:  # 만, 억, 조
-                            current = (current + temp) * unit
-                            temp = 0
-                        else:  # 십, 백, 천
-                            current += temp * unit
-                            temp = 0
-                        i += length
-                        matched = True
-                        break
-            
-            if not matched:
-                # 한국어 숫자가 아닌 문자가 있으면 원본 반환
-                return text
+    result = 0
+    current = 0
+    temp = 0
+    
+    n = len(text)
+    i = 0
+    while i < n:
+        # 긴 단어부터 매칭 시도 (하나, 다섯 등)
+        if i + 1 < n:
+            value = _KO_TWO_CHAR.get(text[i:i+2])
+            if value is not None:
+                temp = value
+                i += 2
+                continue
         
-        result = current + temp
-        return str(result) if result > 0 else text
+        entry = _KO_ONE_CHAR.get(text[i])
+        if entry is None:
+            # 한국어 숫자가 아닌 문자가 있으면 원본 반환
+            return text
         
-    except:
-        return text
+        is_unit, value = entry
+        if not is_unit:
+            temp = value
+        else:
+            if temp == 0:
+                temp = 1
+            
+            if value >= 10000:  # 만, 억, 조
+                current = (current + temp) * value
+                temp = 0
+            else:  # 십, 백, 천
+                current += temp * value
+                temp = 0
+        i += 1
+    
+    result = current + temp
+    return str(result) if result > 0 else text
 
 
 def normalize_numbers(text: str) -> str:
     """
     텍스트 내 한국어 숫자를 아라비아 숫자로 변환
     """
-    # 한국어 숫자 패턴 찾기 (연속된 한국어 숫자 단어)
-    ko_num_chars = ''.join(list(KO_DIGITS.keys()) + list(KO_UNITS.keys()))
-    pattern = f'[{re.escape(ko_num_chars)}]+'
-    
-    def replace_korean_num(match):
-        return korean_to_number(match.group())
-    
-    return re.sub(pattern, replace_korean_num, text)
+    return _KO_NUM_RE.sub(_replace_korean_num, text)
+
+
+def _replace_korean_num(match: re.Match) -> str:
+    return korean_to_number(match.group())
+
+
+# 제거할 문장 부호 (str.translate 테이블 - C 레벨 단일 패스)
+_PUNCT_TABLE = str.maketrans('', '', '.,?!;:"\'-…·()[]「」『』《》<>')
 
 
 def normalize_text(text: str) -> str:
@@ -146,10 +193,9 @@ def normalize_text(text: str) -> str:
     # 한국어 숫자를 아라비아 숫자로 변환
     text = normalize_numbers(text)
     # 문장 부호 제거 (한글, 영문, 숫자만 유지)
-    text = re.sub(r'[.,?!;:"\'\-…·\(\)\[\]「」『』《》<>]', '', text)
-    # 연속 공백을 하나로
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+    text = text.translate(_PUNCT_TABLE)
+    # 연속 공백을 하나로 (앞뒤 공백 제거 포함)
+    return ' '.join(text.split())
 
 
 def normalize_text_no_space(text: str) -> str:
@@ -160,29 +206,101 @@ def normalize_text_no_space(text: str) -> str:
     # 한국어 숫자를 아라비아 숫자로 변환
     text = normalize_numbers(text)
     # 문장 부호 및 공백 모두 제거
-    text = re.sub(r'[.,?!;:"\'\-…·\(\)\[\]「」『』《》<>\s]', '', text)
-    return text
+    return ''.join(text.translate(_PUNCT_TABLE).split())
 
 
-def levenshtein_distance(s1: str, s2: str) -> int:
-    """레벤슈타인 거리 계산"""
-    if len(s1) < len(s2):
-        return levenshtein_distance(s2, s1)
+@lru_cache(maxsize=32)
+def _reference_layout(reference: str) -> Tuple[Tuple[str, ...], Tuple[int, ...], str]:
+    """
+    대본 정규화 캐시 (대본은 스트리밍 중 바뀌지 않으므로 매 호출 재계산 불필요)
     
-    if len(s2) == 0:
-        return len(s1)
+    대본 전체를 한 번만 정규화한 뒤 공백 기준으로 나눠 토큰별 정규화 길이를 구한다.
+    (숫자 변환·문장부호 제거는 공백을 넘나들지 않으므로 토큰별 정규화와 결과가 같음)
     
-    prev_row = range(len(s2) + 1)
-    for i, c1 in enumerate(s1):
-        curr_row = [i + 1]
-        for j, c2 in enumerate(s2):
-            insertions = prev_row[j + 1] + 1
-            deletions = curr_row[j] + 1
-            substitutions = prev_row[j] + (c1 != c2)
-            curr_row.append(min(insertions, deletions, substitutions))
-        prev_row = curr_row
+    Returns:
+        (원본 토큰, 토큰별 정규화 길이, 공백 제거된 전체 문자열)
+    """
+    tokens = tuple(reference.split())
+    normalized = normalize_numbers(' '.join(tokens)).translate(_PUNCT_TABLE).split(' ')
+    return tokens, tuple(len(t) for t in normalized), ''.join(normalized)
+
+
+def levenshtein_distance(s1: str, s2: str, max_distance: Optional[int] = None) -> int:
+    """
+    레벤슈타인 거리 계산 (Myers/Hyyrö 비트 병렬 알고리즘)
+    s1의 각 문자 위치를 비트로 표현해 s2의 문자 하나당 정수 연산 몇 번으로
+    DP 한 열을 통째로 갱신한다. (파이썬 정수는 길이 제한이 없어 64자 초과도 처리)
     
-    return prev_row[-1]
+    Args:
+        max_distance: 지정 시 거리가 이 값을 넘는 것이 확정되는 순간 계산을 멈추고
+            max_distance + 1 을 반환 (Ukkonen 컷오프)
+    """
+    # 긴 쪽을 s1로 (재귀 호출 없이 지역 교환)
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+
+    m = len(s1)
+    n = len(s2)
+
+    if max_distance is None:
+        # 컷오프 없음: score - 남은 열 수는 m + n 을 넘을 수 없음
+        limit = m + n
+    elif m - n > max_distance:
+        # 길이 차이만으로도 허용 거리 초과
+        return max_distance + 1
+    else:
+        limit = max_distance
+
+    if n == 0:
+        return m
+
+    # 문자별 출현 위치 비트마스크
+    peq = {}
+    for i, c in enumerate(s1):
+        peq[c] = peq.get(c, 0) | (1 << i)
+
+    get_eq = peq.get
+    mask = (1 << m) - 1
+    high_bit = 1 << (m - 1)
+    vp = mask  # 수직 +1 델타
+    vn = 0     # 수직 -1 델타
+    score = m
+    # 남은 열마다 점수는 최대 1씩만 줄어들 수 있으므로
+    # score - 남은 열 수 > max_distance 이면 더 볼 필요 없음
+    remaining = n
+
+    for c in s2:
+        eq = get_eq(c, 0)
+        xv = eq | vn
+        xh = (((eq & vp) + vp) ^ vp) | eq
+        hp = vn | ~(xh | vp)
+        hn = vp & xh
+        if hp & high_bit:
+            score += 1
+        elif hn & high_bit:
+            score -= 1
+        remaining -= 1
+        if score - remaining > limit:
+            return limit + 1
+        hp = (hp << 1) | 1
+        hn = hn << 1
+        vp = (hn | ~(xv | hp)) & mask
+        vn = hp & xv
+
+    return score
+
+
+def _max_allowed_distance(max_len: int, threshold: float) -> int:
+    """
+    1 - d / max_len >= threshold 를 만족하는 최대 거리 d (없으면 -1)
+    부동소수점 경계(예: 0.6 * 5)에서도 유사도 식과 결과가 같도록 보정
+    """
+    k = int((1 - threshold) * max_len)
+    while k < max_len and 1 - ((k + 1) / max_len) >= threshold:
+        k += 1
+    while k >= 0 and 1 - (k / max_len) < threshold:
+        k -= 1
+    return k
 
 
 def is_similar(ref_token: str, hyp_token: str, threshold: float = 0.6) -> bool:
@@ -212,10 +330,14 @@ def is_similar(ref_token: str, hyp_token: str, threshold: float = 0.6) -> bool:
     
     # 레벤슈타인 거리 기반 유사도
     max_len = max(len(ref_norm), len(hyp_norm))
-    distance = levenshtein_distance(ref_norm, hyp_norm)
-    similarity = 1 - (distance / max_len)
+    # 허용 거리를 넘는 것이 확정되면 계산을 조기 종료
+    max_k = _max_allowed_distance(max_len, threshold)
+    if max_k < 0:
+        return False
+    if _rf_levenshtein is not None:
+        return _rf_levenshtein.distance(ref_norm, hyp_norm, score_cutoff=max_k) <= max_k
     
-    return similarity >= threshold
+    return levenshtein_distance(ref_norm, hyp_norm, max_k) <= max_k
 
 
 class LenientWordTransform(jiwer.AbstractTransform):
@@ -239,6 +361,7 @@ def compute_alignment(reference: str, hypothesis: str, similarity_threshold: flo
     """
     Reference와 Hypothesis 텍스트를 정렬하고 메트릭을 계산합니다.
     순차적 매칭: 앞에서부터 순서대로 비교, 제한된 lookahead만 사용
+    (이전 상태 없이 한 번 정렬 - 스트리밍 갱신에는 StreamingAligner 사용)
     
     Args:
         reference: Ground Truth 텍스트
@@ -248,111 +371,243 @@ def compute_alignment(reference: str, hypothesis: str, similarity_threshold: flo
     Returns:
         (정렬된 토큰 리스트, 부분 메트릭)
     """
-    if not reference:
-        return [], PartialMetrics(0.0, 0.0, 0, 0, 0, 0, 0)
-    
-    # 원본 토큰 (표시용)
-    ref_tokens_orig = reference.split()
-    
-    if not hypothesis:
-        # hypothesis가 없으면 모든 reference가 pending
-        aligned = [AlignedToken(t, AlignType.PENDING) for t in ref_tokens_orig]
-        return aligned, PartialMetrics(0.0, 0.0, 0, 0, 0, 0, 0)
-    
-    # 공백 제거된 전체 문자열 (비교용)
-    ref_no_space = normalize_text_no_space(reference)
-    hyp_no_space = normalize_text_no_space(hypothesis)
-    
-    if not ref_no_space:
-        return [], PartialMetrics(0.0, 0.0, 0, 0, 0, 0, 0)
-    
-    if not hyp_no_space:
-        aligned = [AlignedToken(t, AlignType.PENDING) for t in ref_tokens_orig]
-        return aligned, PartialMetrics(0.0, 0.0, 0, 0, 0, 0, 0)
-    
-    # 순차적 문자 매칭 (제한된 lookahead)
-    char_states, last_ref_idx = sequential_char_align(ref_no_space, hyp_no_space, max_lookahead=3)
-    
-    # 각 원본 토큰이 차지하는 문자 범위 계산
-    token_char_ranges = []
-    char_idx = 0
-    for token in ref_tokens_orig:
-        token_normalized = normalize_text_no_space(token)
-        if token_normalized:
-            start = char_idx
-            end = char_idx + len(token_normalized)
-            token_char_ranges.append((start, end, token))
-            char_idx = end
+    return StreamingAligner().update(reference, hypothesis, similarity_threshold)
+
+
+class StreamingAligner:
+    """
+    스트리밍 STT용 증분 정렬기
+    
+    실시간 STT에서는 hypothesis가 뒤에 덧붙는 형태로만 자라므로,
+    직전 호출의 문자 정렬 상태를 보관했다가 새로 붙은 부분만 이어서 정렬한다.
+    
+    - lookahead 창이 기존 hypothesis 안에 완전히 들어가는 구간까지의 판정은
+      뒤에 문자가 더 붙어도 바뀌지 않으므로 그 지점을 체크포인트로 저장
+    - 다음 호출에서 정규화된 hypothesis가 이전 값으로 시작하면 체크포인트부터 재개
+    - 체크포인트 앞에서 끝나는 토큰은 분류 결과도 확정되므로 다시 분류하지 않음
+    - 대본이 바뀌거나 hypothesis가 앞부분부터 달라지면 처음부터 다시 정렬
+    
+    결과는 compute_alignment와 항상 동일하다.
+    """
+    
+    def __init__(self, max_lookahead: int = 3):
+        self.max_lookahead = max_lookahead
+        self.reset()
+        
+    def reset(self) -> None:
+        """보관 중인 정렬 상태 초기화"""
+        # 확정 토큰은 원본 대본의 토큰 구성에 묶이므로 원본 문자열도 함께 보관
+        self._reference = ""
+        self._ref_no_space = ""
+        self._hyp_no_space = ""
+        self._states = bytearray()
+        self._ref_idx = 0
+        # 체크포인트 (이 지점까지의 판정은 hypothesis가 자라도 그대로 유지됨)
+        self._stable_ref_idx = 0
+        self._stable_hyp_idx = 0
+        self._reset_frozen(None)
+        
+    def _reset_frozen(self, similarity_threshold: Optional[float]) -> None:
+        """확정 토큰 캐시 초기화"""
+        self._frozen_threshold = similarity_threshold
+        self._frozen_tokens: List[AlignedToken] = []
+        self._frozen_counts = [0, 0, 0, 0]
+        self._frozen_token_idx = 0
+        self._frozen_char_idx = 0
+        
+    def update(self, reference: str, hypothesis: str, similarity_threshold: float = 0.6) -> Tuple[List[AlignedToken], PartialMetrics]:
+        """
+        최신 hypothesis로 정렬을 갱신 (인자/반환값은 compute_alignment와 동일)
+        """
+        if not reference:
+            return [], PartialMetrics(0.0, 0.0, 0, 0, 0, 0, 0)
+        
+        # 원본 토큰 (표시용), 토큰별 정규화 길이, 공백 제거된 전체 문자열 (비교용)
+        ref_tokens_orig, ref_token_lens, ref_no_space = _reference_layout(reference)
+        
+        if not hypothesis:
+            # hypothesis가 없으면 모든 reference가 pending
+            aligned = [AlignedToken(t, AlignType.PENDING) for t in ref_tokens_orig]
+            return aligned, PartialMetrics(0.0, 0.0, 0, 0, 0, 0, 0, has_pending=bool(aligned))
+        
+        hyp_no_space = normalize_text_no_space(hypothesis)
+        
+        if not ref_no_space:
+            return [], PartialMetrics(0.0, 0.0, 0, 0, 0, 0, 0)
+        
+        if not hyp_no_space:
+            aligned = [AlignedToken(t, AlignType.PENDING) for t in ref_tokens_orig]
+            return aligned, PartialMetrics(0.0, 0.0, 0, 0, 0, 0, 0, has_pending=bool(aligned))
+        
+        # 순차적 문자 매칭 (제한된 lookahead, 가능하면 체크포인트부터 재개)
+        # 정규화 결과가 같아도 띄어쓰기/문장부호가 다르면 토큰 구성이 달라지므로 원본으로 비교
+        same_reference = reference == self._reference
+        self._reference = reference
+        char_states, last_ref_idx = self._align_chars(ref_no_space, hyp_no_space, same_reference)
+        
+        if similarity_threshold != self._frozen_threshold:
+            self._reset_frozen(similarity_threshold)
+        
+        # 체크포인트 앞에서 끝나는 토큰은 확정 캐시에 이어 붙임
+        self._frozen_token_idx, self._frozen_char_idx = _classify_tokens(
+            ref_tokens_orig, ref_token_lens, char_states, last_ref_idx,
+            similarity_threshold, self._frozen_tokens, self._frozen_counts,
+            self._frozen_token_idx, self._frozen_char_idx,
+            stop_char=self._stable_ref_idx,
+        )
+        
+        # 나머지 토큰만 분류 (확정 토큰 객체는 그대로 재사용)
+        aligned_tokens = self._frozen_tokens.copy()
+        counts = self._frozen_counts.copy()
+        _classify_tokens(
+            ref_tokens_orig, ref_token_lens, char_states, last_ref_idx,
+            similarity_threshold, aligned_tokens, counts,
+            self._frozen_token_idx, self._frozen_char_idx,
+        )
+        
+        metrics = _alignment_metrics(counts, ref_no_space, hyp_no_space, last_ref_idx)
+        return aligned_tokens, metrics
+        
+    def _align_chars(self, ref: str, hyp: str, same_reference: bool) -> Tuple[bytearray, int]:
+        """문자 상태 갱신 후 (상태 리스트, 마지막으로 처리된 ref 인덱스) 반환"""
+        max_lookahead = self.max_lookahead
+        
+        if same_reference and ref == self._ref_no_space and hyp.startswith(self._hyp_no_space):
+            # 체크포인트 이후에 기록됐던 상태만 되돌리고 이어서 정렬
+            states = self._states
+            ref_idx = self._stable_ref_idx
+            hyp_idx = self._stable_hyp_idx
+            states[ref_idx:self._ref_idx] = bytes(self._ref_idx - ref_idx)
         else:
-            # 정규화 후 빈 토큰 (문장부호만 있는 경우)
-            token_char_ranges.append((char_idx, char_idx, token))
-    
-    # 토큰별 상태 결정
-    aligned_tokens: List[AlignedToken] = []
-    total_hits = 0
-    total_subs = 0
-    total_dels = 0
-    
-    for start, end, token in token_char_ranges:
-        if start == end:
-            # 빈 토큰 (문장부호만) -> HIT로 처리
-            aligned_tokens.append(AlignedToken(token, AlignType.HIT))
-            continue
+            states = bytearray(len(ref))  # 0 == _PENDING
+            ref_idx = 0
+            hyp_idx = 0
+            self._reset_frozen(None)
         
-        # 해당 토큰의 문자들 상태 확인
-        token_states = char_states[start:end]
+        # 1단계: lookahead 창이 hyp 안에 완전히 들어가는 구간 (확정 구간)
+        ref_idx, hyp_idx = _char_walk(
+            ref, hyp, max_lookahead, states, ref_idx, hyp_idx, len(hyp) - max_lookahead
+        )
+        self._stable_ref_idx = ref_idx
+        self._stable_hyp_idx = hyp_idx
         
-        if not token_states:
-            aligned_tokens.append(AlignedToken(token, AlignType.PENDING))
-            continue
+        # 2단계: hyp 끝까지
+        ref_idx, hyp_idx = _char_walk(
+            ref, hyp, max_lookahead, states, ref_idx, hyp_idx, len(hyp)
+        )
         
-        # 토큰이 아직 처리되지 않은 부분인지 확인
-        if start > last_ref_idx:
-            aligned_tokens.append(AlignedToken(token, AlignType.PENDING))
-            continue
+        self._ref_no_space = ref
+        self._hyp_no_space = hyp
+        self._states = states
+        self._ref_idx = ref_idx
         
-        # 상태 카운트
-        hits = token_states.count('hit')
-        subs = token_states.count('sub')
-        dels = token_states.count('del')
-        pendings = token_states.count('pending')
+        # 상태는 항상 ref_idx 앞쪽에만 기록되므로 마지막 처리 위치는 ref_idx - 1
+        return states, ref_idx - 1
+
+
+def _classify_tokens(
+    ref_tokens_orig: Tuple[str, ...],
+    ref_token_lens: Tuple[int, ...],
+    char_states: bytearray,
+    last_ref_idx: int,
+    similarity_threshold: float,
+    aligned_tokens: List[AlignedToken],
+    counts: List[int],
+    token_idx: int = 0,
+    char_idx: int = 0,
+    stop_char: Optional[int] = None,
+) -> Tuple[int, int]:
+    """
+    문자 상태로부터 토큰별 정렬 결과 계산
+    token_idx 번째 토큰(문자 위치 char_idx)부터 분류해 aligned_tokens에 추가하고
+    상태 코드별 토큰 수를 counts에 누적한다.
+    
+    Args:
+        stop_char: 지정 시 이 문자 위치를 넘어서 끝나는 토큰 앞에서 멈춤
         
-        # 일부만 처리된 경우 (토큰 중간에서 끊긴 경우)
-        if pendings > 0 and pendings < len(token_states):
-            # 처리된 부분 비율로 판단
-            processed = hits + subs + dels
-            if processed > 0:
-                hit_ratio = hits / processed
-                if hit_ratio >= similarity_threshold:
-                    aligned_tokens.append(AlignedToken(token, AlignType.HIT))
-                    total_hits += 1
-                else:
-                    aligned_tokens.append(AlignedToken(token, AlignType.SUB))
-                    total_subs += 1
-            else:
-                aligned_tokens.append(AlignedToken(token, AlignType.PENDING))
-            continue
+    Returns:
+        다음에 분류할 (token_idx, char_idx)
+    """
+    # 토큰별 상태 결정 (문자 범위 계산과 분류를 한 번의 순회로 처리)
+    # 각 토큰은 문자 상태와 같은 코드(_PENDING/_HIT/_SUB/_DEL)로 분류하고,
+    # 코드로 AlignType 테이블과 카운터 리스트를 바로 인덱싱한다
+    # 루프 안 속성 조회를 줄이기 위한 지역 바인딩
+    append = aligned_tokens.append
+    align_types = _CODE_ALIGN_TYPES
+    HIT = AlignType.HIT
+    if stop_char is None:
+        stop_char = len(char_states)
+    
+    for token, token_len in zip(ref_tokens_orig[token_idx:], ref_token_lens[token_idx:]):
+        # 원본 토큰이 차지하는 문자 범위
+        start = char_idx
+        end = char_idx + token_len
+        if end > stop_char:
+            break
+        token_idx += 1
         
-        # 전부 pending이면
-        if pendings == len(token_states):
-            aligned_tokens.append(AlignedToken(token, AlignType.PENDING))
+        if not token_len:
+            # 빈 토큰 (문장부호만) -> HIT로 처리 (메트릭에는 포함하지 않음)
+            append(AlignedToken(token, HIT))
             continue
         
-        token_len = hits + subs + dels
-        hit_ratio = hits / token_len if token_len > 0 else 0
+        char_idx = end
         
-        # 60% 이상 hit이면 전체를 HIT로 처리
-        if hit_ratio >= similarity_threshold:
-            aligned_tokens.append(AlignedToken(token, AlignType.HIT))
-            total_hits += 1
-        elif hits + subs > dels:
-            # substitution이 많으면 SUB
-            aligned_tokens.append(AlignedToken(token, AlignType.SUB))
-            total_subs += 1
+        if start > last_ref_idx:
+            # 토큰이 아직 처리되지 않은 부분
+            code = _PENDING
         else:
-            # deletion이 많으면 DEL
-            aligned_tokens.append(AlignedToken(token, AlignType.DEL))
-            total_dels += 1
+            # 처리된 문자는 항상 [0, last_ref_idx] 구간에 연속으로 놓이므로
+            # pending 개수는 스캔 없이 계산하고, 처리된 부분만 카운트한다
+            # (bytearray.count의 범위 인자로 슬라이스 복사 없이 C 레벨 카운트)
+            processed_end = min(end, last_ref_idx + 1)
+            pendings = end - processed_end
+            processed = processed_end - start
+            hits = char_states.count(_HIT, start, processed_end)
+            subs = char_states.count(_SUB, start, processed_end)
+            dels = processed - hits - subs
+            
+            # 60% 이상 hit이면 전체를 HIT로 처리
+            # (토큰 중간에서 끊긴 경우도 처리된 부분 비율로 판단)
+            if hits / processed >= similarity_threshold:
+                code = _HIT
+            elif pendings > 0 or hits + subs > dels:
+                # 중간에서 끊겼거나 substitution이 많으면 SUB
+                code = _SUB
+            else:
+                # deletion이 많으면 DEL
+                code = _DEL
+        
+        counts[code] += 1
+        append(AlignedToken(token, align_types[code]))
+    
+    return token_idx, char_idx
+
+
+@lru_cache(maxsize=64)
+def _cached_cer(reference: str, hypothesis: str) -> float:
+    """
+    jiwer.cer 결과 캐시
+    UI 갱신 주기마다 같은 (처리된 대본, hypothesis) 쌍이 반복 계산되는 경우가 많음
+    
+    공백이 제거된 문자열끼리의 CER은 문자 편집 거리 / reference 길이와 같으므로,
+    rapidfuzz가 있으면 jiwer 변환 파이프라인을 거치지 않고 거리만 직접 계산
+    """
+    if _rf_levenshtein is not None:
+        return _rf_levenshtein.distance(reference, hypothesis) / len(reference)
+    return jiwer.cer(reference, hypothesis)
+
+
+def _alignment_metrics(
+    counts: List[int],
+    ref_no_space: str,
+    hyp_no_space: str,
+    last_ref_idx: int,
+) -> PartialMetrics:
+    """토큰 분류 결과(상태 코드별 토큰 수)로부터 부분 메트릭 계산"""
+    total_hits = counts[_HIT]
+    total_subs = counts[_SUB]
+    total_dels = counts[_DEL]
     
     # 메트릭 계산
     ref_processed = total_hits + total_subs + total_dels
@@ -362,102 +617,127 @@ def compute_alignment(reference: str, hypothesis: str, similarity_threshold: flo
         wer = 0.0
     
     # CER 계산 (처리된 부분만)
-    try:
-        if last_ref_idx >= 0:
-            partial_ref = ref_no_space[:last_ref_idx + 1]
-            if partial_ref and hyp_no_space:
-                cer = jiwer.cer(partial_ref, hyp_no_space)
-            else:
-                cer = 0.0
-        else:
-            cer = 0.0
-    except:
-        cer = 0.0
-    
-    metrics = PartialMetrics(
+    # 호출 측에서 hyp_no_space가 비어 있지 않음을 보장하고, last_ref_idx >= 0 이면
+    # partial_ref도 비어 있지 않으므로 jiwer가 입력 오류를 낼 수 있는 경우는 미리 걸러짐
+    cer = 0.0
+    if last_ref_idx >= 0:
+        partial_ref = ref_no_space[:last_ref_idx + 1]
+        try:
+            cer = _cached_cer(partial_ref, hyp_no_space)
+        except ValueError as e:
+            _warn_throttled(f"CER 계산 실패: {e}")
+    
+    return PartialMetrics(
         wer=wer,
         cer=cer,
         hits=total_hits,
         substitutions=total_subs,
         deletions=total_dels,
         insertions=0,
-        ref_processed=ref_processed
+        ref_processed=ref_processed,
+        has_pending=counts[_PENDING] > 0,
     )
-    
-    return aligned_tokens, metrics
 
 
-def sequential_char_align(ref: str, hyp: str, max_lookahead: int = 3) -> Tuple[List[str], int]:
+def _char_walk(
+    ref: str,
+    hyp: str,
+    max_lookahead: int,
+    states: bytearray,
+    ref_idx: int,
+    hyp_idx: int,
+    hyp_limit: int,
+) -> Tuple[int, int]:
     """
-    순차적 문자 매칭 (제한된 lookahead)
+    문자 정렬 커널: (ref_idx, hyp_idx)에서 시작해 hyp_idx가 hyp_limit에 닿을 때까지 진행
+    상태를 문자열 대신 정수 코드(_PENDING/_HIT/_SUB/_DEL)로 states에 기록하고,
+    루프 안에서 쓰는 길이·상수를 지역 변수로 끌어올려 문자당 바이트코드를 줄인다.
+    연속 일치 구간은 슬라이스 비교로 한 번에 처리하고,
+    lookahead 탐색은 범위를 제한한 str.find로 처리한다.
     
-    앞에서부터 순서대로 비교하면서:
-    - 일치하면 hit
-    - 불일치 시 max_lookahead 범위 내에서만 탐색
-    - 범위 내 못 찾으면 sub 처리
-    
-    Args:
-        ref: 공백 제거된 reference 문자열
-        hyp: 공백 제거된 hypothesis 문자열
-        max_lookahead: 앞으로 탐색할 최대 문자 수
-        
     Returns:
-        (ref 길이만큼의 상태 리스트, 마지막으로 처리된 ref 인덱스)
+        진행이 멈춘 (ref_idx, hyp_idx)
     """
-    ref_states = ['pending'] * len(ref)
-    ref_idx = 0
-    hyp_idx = 0
-    
-    while ref_idx < len(ref) and hyp_idx < len(hyp):
+    ref_len = len(ref)
+    hyp_end = min(hyp_limit, len(hyp))
+    streak = 0  # 연속 일치 문자 수
+
+    while ref_idx < ref_len and hyp_idx < hyp_end:
+        h = hyp[hyp_idx]
         # 현재 문자 비교
-        if ref[ref_idx] == hyp[hyp_idx]:
-            ref_states[ref_idx] = 'hit'
+        if ref[ref_idx] == h:
+            states[ref_idx] = _HIT
             ref_idx += 1
             hyp_idx += 1
+            streak += 1
+            if streak >= _RUN_STREAK:
+                # 일치가 이어지는 구간은 블록 단위 슬라이스 비교로 한 번에 건너뜀
+                while (ref_idx + _RUN_BLOCK <= ref_len and hyp_idx + _RUN_BLOCK <= hyp_end
+                       and ref[ref_idx:ref_idx + _RUN_BLOCK] == hyp[hyp_idx:hyp_idx + _RUN_BLOCK]):
+                    states[ref_idx:ref_idx + _RUN_BLOCK] = _HIT_BLOCK
+                    ref_idx += _RUN_BLOCK
+                    hyp_idx += _RUN_BLOCK
+                streak = 0
             continue
-        
-        # 불일치 - lookahead로 탐색
-        found = False
+
+        streak = 0
         
         # Case 1: ref에서 deletion 탐색 (hyp의 현재 문자가 ref의 앞쪽에 있는지)
-        for look in range(1, max_lookahead + 1):
-            if ref_idx + look < len(ref) and ref[ref_idx + look] == hyp[hyp_idx]:
-                # ref_idx ~ ref_idx+look-1 은 DEL (누락)
-                for i in range(ref_idx, ref_idx + look):
-                    ref_states[i] = 'del'
-                ref_idx += look
-                # 매칭된 문자는 다음 루프에서 처리
-                found = True
-                break
-        
-        if found:
+        # lookahead 범위로 제한한 str.find (C 레벨 탐색)
+        found = ref.find(h, ref_idx + 1, ref_idx + max_lookahead + 1)
+        if found != -1:
+            # ref_idx ~ found-1 은 DEL (누락)
+            states[ref_idx:found] = _DEL_BYTE * (found - ref_idx)
+            ref_idx = found
+            # 매칭된 문자는 다음 루프에서 처리
             continue
-        
+
         # Case 2: hyp에서 insertion 탐색 (ref의 현재 문자가 hyp의 앞쪽에 있는지)
-        for look in range(1, max_lookahead + 1):
-            if hyp_idx + look < len(hyp) and hyp[hyp_idx + look] == ref[ref_idx]:
-                # hyp_idx ~ hyp_idx+look-1 은 INS (삽입된 것, 무시)
-                hyp_idx += look
-                # 매칭된 문자는 다음 루프에서 처리
-                found = True
-                break
-        
-        if found:
+        found = hyp.find(ref[ref_idx], hyp_idx + 1, hyp_idx + max_lookahead + 1)
+        if found != -1:
+            # hyp_idx ~ found-1 은 INS (삽입된 것, 무시)
+            hyp_idx = found
+            # 매칭된 문자는 다음 루프에서 처리
             continue
-        
+
         # Case 3: 둘 다 못 찾음 - substitution
-        ref_states[ref_idx] = 'sub'
+        states[ref_idx] = _SUB
         ref_idx += 1
         hyp_idx += 1
-    
+
+    return ref_idx, hyp_idx
+
+
+def _char_align(ref: str, hyp: str, max_lookahead: int) -> Tuple[bytearray, int]:
+    """
+    sequential_char_align의 내부 구현 (상태 코드 bytearray 반환)
+    """
+    states = bytearray(len(ref))  # 0 == _PENDING
+    ref_idx, _ = _char_walk(ref, hyp, max_lookahead, states, 0, 0, len(hyp))
     # 마지막으로 처리된 ref 인덱스 (hit, sub, del 중 하나인 마지막 위치)
-    last_processed = -1
-    for i in range(len(ref_states) - 1, -1, -1):
-        if ref_states[i] != 'pending':
-            last_processed = i
-            break
+    # 상태는 항상 ref_idx 앞쪽에만 기록되므로 역방향 스캔 없이 바로 구한다
+    return states, ref_idx - 1
+
+
+def sequential_char_align(ref: str, hyp: str, max_lookahead: int = 3) -> Tuple[List[str], int]:
+    """
+    순차적 문자 매칭 (제한된 lookahead)
     
-    return ref_states, last_processed
+    앞에서부터 순서대로 비교하면서:
+    - 일치하면 hit
+    - 불일치 시 max_lookahead 범위 내에서만 탐색
+    - 범위 내 못 찾으면 sub 처리
+    
+    Args:
+        ref: 공백 제거된 reference 문자열
+        hyp: 공백 제거된 hypothesis 문자열
+        max_lookahead: 앞으로 탐색할 최대 문자 수
+        
+    Returns:
+        (ref 길이만큼의 상태 리스트, 마지막으로 처리된 ref 인덱스)
+    """
+    states, last_processed = _char_align(ref, hyp, max_lookahead)
+    return [_STATE_NAMES[c] for c in states], last_processed
 
 
 if __name__ == "__main__":
@@ -555,4 +835,18 @@ if __name__ == "__main__":
     aligned, metrics = compute_alignment(ref, hyp)
     for token in aligned:
         print(f"{token.text}: {token.align_type.value}")
-    print(f"\nWER: {metrics.wer:.2%}, CER: {metrics.cer:.2%}")
\ No newline at end of file
+    print(f"\nWER: {metrics.wer:.2%}, CER: {metrics.cer:.2%}")
+    
+    print("\n=== 테스트 10: 스트리밍 정렬 (정규화 결과가 같은 대본 교체) ===")
+    refs = ["가나 다라 마바 사아", "가나다라 마바 사아"]  # 띄어쓰기만 다른 대본
+    hyp = "가나다라마바사"
+    
+    aligner = StreamingAligner()
+    for i in range(1, len(hyp) + 1):
+        ref = refs[i % 2]
+        streamed, _ = aligner.update(ref, hyp[:i])
+        expected, _ = compute_alignment(ref, hyp[:i])
+        assert [(t.text, t.align_type) for t in streamed] == \
+            [(t.text, t.align_type) for t in expected], (ref, hyp[:i])
+    for token in streamed:
+        print(f"{token.text}: {token.align_type.value}")
@@ -1,14 +1,18 @@
 import os, sys
 
+# 기준 경로는 프로세스 시작 시 한 번만 계산 (이후 os.chdir 영향도 받지 않음)
+_RESOURCE_DIR = getattr(sys, '_MEIPASS', None) or os.path.abspath(".")
+
+if getattr(sys, 'frozen', False):
+    _BASE_DIR = os.path.dirname(sys.executable)  # exe 위치
+else:
+    _BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # 개발 환경
+
+
 def resource_path(filename):
-    if hasattr(sys, '_MEIPASS'):
-        return os.path.join(sys._MEIPASS, filename)
-    return os.path.join(os.path.abspath("."), filename)
+    return os.path.join(_RESOURCE_DIR, filename)
 
 
 def get_base_dir():
     """PyInstaller 환경에서도 실행 파일 기준 경로 찾기"""
-    if getattr(sys, 'frozen', False):
-        return os.path.dirname(sys.executable)  # exe 위치
-    else:
-        return os.path.dirname(os.path.abspath(__file__))  # 개발 환경
\ No newline at end of file
+    return _BASE_DIR
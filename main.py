@@ -2,24 +2,55 @@
 main.py - STT Live Monitor 메인 애플리케이션
 """
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import messagebox
 import threading
+import selectors
+import queue
 import socket
 import struct
 import json
 import os
-from typing import List, Optional
+from collections import deque
+from typing import Deque, Optional
 from dotenv import load_dotenv
 
+try:
+    # 설치되어 있으면 더 빠른 orjson으로 토큰 패킷 파싱
+    # (orjson.JSONDecodeError는 json.JSONDecodeError의 하위 클래스)
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
 from ui.main_window import MainWindow
-from alignment import compute_alignment, AlignType
+from alignment import StreamingAligner
 from subtitle_client import SubtitleClient
 
-from etc import get_base_dir, resource_path
+from etc import get_base_dir
 
 # 환경 변수 로드
 load_dotenv()
 
+# 패킷 포맷 (Little Endian, 포맷 문자열은 모듈 로드 시 한 번만 해석)
+# 모니터 패킷 헤더: checkcode(4) + req_code(4) + data_size(4)
+_PACKET_HEADER = struct.Struct("<iii")
+_HEADER_SIZE = _PACKET_HEADER.size
+# 응답: resp_checkcode(4) + req_code(4) + status(1)
+_RESPONSE = struct.Struct("<iiB")
+_STATUS_OK = 0
+# 한 번의 recv로 읽을 최대 크기
+_RECV_CHUNK = 65536
+
+
+class _ClientConn:
+    """이벤트 루프에 등록된 클라이언트 연결 상태 (수신 버퍼 + 송신 대기 버퍼)"""
+    __slots__ = ("sock", "inbuf", "outbuf")
+    
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.inbuf = bytearray()
+        # 송신 버퍼가 차서 다 못 보낸 응답 (EVENT_WRITE 때 이어서 전송)
+        self.outbuf = bytearray()
+
 
 class STTMonitorApp:
     """STT 모니터 애플리케이션 컨트롤러"""
@@ -52,8 +83,19 @@ class STTMonitorApp:
         
         # 상태 관리
         self.reference_text = ""
-        self.hypothesis_tokens: List[str] = []
-        self._tokens_lock = threading.Lock()
+        # 아직 hypothesis 문자열에 붙이지 않은 새 토큰
+        # 서버 스레드가 append, UI 스레드가 popleft로 꺼냄 (deque 연산은 GIL 하에서 원자적이라 락 불필요)
+        self.hypothesis_tokens: Deque[str] = deque()
+        # 증분 정렬기 (새로 붙은 hypothesis만 이어서 정렬)
+        self._aligner = StreamingAligner()
+        # 토큰이 추가될 때마다 증가하는 세대 번호 (서버 스레드만 갱신)
+        self._hyp_generation = 0
+        # 마지막으로 화면에 반영한 세대 (새 토큰이 없으면 갱신 생략)
+        self._rendered_generation: Optional[int] = None
+        # 지금까지 이어 붙인 hypothesis 문자열
+        self._hyp_text = ""
+        # UI 갱신이 예약되어 있는지 여부 (토큰이 몰려 들어올 때 갱신 합치기)
+        self._update_pending = False
         
         self.is_running = False
         self.is_completed = False  # 자막 비교 완료 플래그
@@ -62,6 +104,9 @@ class STTMonitorApp:
         # 자막 클라이언트 초기화
         self.subtitle_client: Optional[SubtitleClient] = None
         self.subtitle_connected = False
+        # 자막 서버로 보낼 본문 (이벤트 루프가 넣고 전송 스레드가 꺼내 전송)
+        # 자막 서버 연결/응답 대기(최대 timeout)가 모니터 클라이언트 처리를 막지 않도록 분리
+        self._subtitle_queue: "queue.Queue[Optional[bytes]]" = queue.Queue()
         
         # UI 초기화
         self.ui = MainWindow(root, appVersion="1.0.0")
@@ -98,7 +143,7 @@ class STTMonitorApp:
             host=self.SUBTITLE_HOST,
             port=self.SUBTITLE_PORT,
             checkcode=self.SUBTITLE_CHECKCODE,
-            status_cb=lambda msg: print(msg)
+            status_cb=print
         )
         
         self.subtitle_connected = self.subtitle_client.connect()
@@ -137,8 +182,9 @@ class STTMonitorApp:
             self.ui.set_status(f"대본 로드 완료 ({len(self.reference_text)}자) - 대기 중", "blue")
             
             # 상태 초기화
-            with self._tokens_lock:
-                self.hypothesis_tokens = []
+            self.hypothesis_tokens = deque()
+            self._reset_hypothesis_cache()
+            self._aligner.reset()
             self.is_completed = False  # 완료 플래그 초기화
             self.ui.reset_metrics()
             
@@ -147,8 +193,9 @@ class STTMonitorApp:
             
     def _reset_state(self):
         """상태 초기화"""
-        with self._tokens_lock:
-            self.hypothesis_tokens = []
+        self.hypothesis_tokens = deque()
+        self._reset_hypothesis_cache()
+        self._aligner.reset()
         
         self.is_completed = False  # 완료 플래그 초기화
         self.ui.reset_metrics()
@@ -171,92 +218,167 @@ class STTMonitorApp:
         else:
             self.ui.set_status(f"모니터링 중 (대본 없음) - {self.HOST}:{self.PORT}", "green")
         
-        # 서버 스레드 시작
+        # 서버 스레드 / 자막 전송 스레드 시작
         threading.Thread(target=self._server_loop, daemon=True).start()
-        
-        # 주기적 업데이트 스케줄 (500ms마다)
-        self._schedule_update()
+        threading.Thread(target=self._subtitle_loop, daemon=True).start()
         
     def _server_loop(self):
-        """서버 메인 루프"""
+        """서버 메인 루프 (selectors 기반 단일 스레드 이벤트 루프)"""
+        sel = selectors.DefaultSelector()
         try:
             self.server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             self.server_sock.bind((self.HOST, self.PORT))
             self.server_sock.listen(5)
-            self.server_sock.settimeout(1.0)
+            self.server_sock.setblocking(False)
+            # 리스닝 소켓은 data=None, 클라이언트 소켓은 data=_ClientConn
+            sel.register(self.server_sock, selectors.EVENT_READ, None)
             
             while self.is_running:
-                try:
-                    conn, addr = self.server_sock.accept()
-                    threading.Thread(
-                        target=self._handle_client, 
-                        args=(conn,), 
-                        daemon=True
-                    ).start()
-                except socket.timeout:
-                    continue
+                # 타임아웃은 종료 플래그 확인용 (이벤트가 오면 즉시 깨어남)
+                for key, mask in sel.select(timeout=1.0):
+                    client = key.data
+                    if client is None:
+                        self._accept_client(sel)
+                        continue
+                    if mask & selectors.EVENT_WRITE:
+                        if not self._flush_client(sel, client):
+                            continue
+                    if mask & selectors.EVENT_READ:
+                        self._read_client(sel, client)
         except Exception as e:
             print(f"[Server Error] {e}")
         finally:
+            for key in list(sel.get_map().values()):
+                if key.data is not None:
+                    key.fileobj.close()
+            sel.close()
             if self.server_sock:
                 self.server_sock.close()
                 
-    def _handle_client(self, conn: socket.socket):
-        """클라이언트 연결 처리"""
-        with conn:
+    def _accept_client(self, sel: selectors.BaseSelector):
+        """새 클라이언트 연결을 논블로킹으로 등록"""
+        try:
+            conn, addr = self.server_sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        conn.setblocking(False)
+        # 토큰 패킷은 작고 요청/응답이 반복되므로 Nagle 알고리즘 비활성화
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sel.register(conn, selectors.EVENT_READ, _ClientConn(conn))
+        
+    def _close_client(self, sel: selectors.BaseSelector, client: _ClientConn):
+        sel.unregister(client.sock)
+        client.sock.close()
+        
+    def _flush_client(self, sel: selectors.BaseSelector, client: _ClientConn) -> bool:
+        """
+        송신 대기 버퍼를 보낼 수 있는 만큼 전송 (연결이 끊겼으면 False)
+        다 못 보내면 EVENT_WRITE를 함께 감시하고, 다 보내면 다시 EVENT_READ만 감시
+        """
+        outbuf = client.outbuf
+        try:
+            sent = client.sock.send(outbuf)
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError as e:
+            print(f"[Client Error] {e}")
+            self._close_client(sel, client)
+            return False
+        del outbuf[:sent]
+        events = selectors.EVENT_READ | selectors.EVENT_WRITE if outbuf else selectors.EVENT_READ
+        if sel.get_key(client.sock).events != events:
+            sel.modify(client.sock, events, client)
+        return True
+        
+    def _read_client(self, sel: selectors.BaseSelector, client: _ClientConn):
+        """
+        클라이언트 데이터 수신 및 처리
+        받은 데이터를 연결별 버퍼에 쌓아두고, 헤더(8) → 크기(4) → 페이로드(N)가
+        모두 모인 패킷부터 차례로 처리한다 (패킷이 여러 번에 나뉘어 와도 됨)
+        """
+        try:
+            chunk = client.sock.recv(_RECV_CHUNK)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            print(f"[Client Error] {e}")
+            self._close_client(sel, client)
+            return
+        if not chunk:
+            self._close_client(sel, client)
+            return
+        buf = client.inbuf
+        buf.extend(chunk)
+        
+        try:
+            offset = 0
+            while len(buf) - offset >= _HEADER_SIZE:
+                checkcode, req_code, data_size = _PACKET_HEADER.unpack_from(buf, offset)
+                if data_size < 0:
+                    self._close_client(sel, client)
+                    return
+                end = offset + _HEADER_SIZE + data_size
+                if len(buf) < end:
+                    break
+                payload = bytes(buf[offset + _HEADER_SIZE:end])
+                offset = end
+                self._handle_packet(client, req_code, payload)
+            del buf[:offset]
+        except Exception as e:
+            print(f"[Client Error] {e}")
+            self._close_client(sel, client)
+            return
+        
+        # 이번에 처리한 패킷들의 응답을 한 번에 전송 (앞서 못 보낸 응답이 있으면 EVENT_WRITE가 처리)
+        if client.outbuf and sel.get_key(client.sock).events == selectors.EVENT_READ:
+            self._flush_client(sel, client)
+            
+    def _handle_packet(self, client: _ClientConn, req_code: int, payload: bytes):
+        """수신된 패킷 하나 처리 후 응답을 송신 대기 버퍼에 추가"""
+        # JSON 파싱 및 토큰 추가
+        try:
             try:
-                while self.is_running:
-                    # 헤더 수신 (checkcode, req_code)
-                    header = conn.recv(8)
-                    if not header or len(header) < 8:
-                        break
-                        
-                    checkcode, req_code = struct.unpack("<ii", header)
-                    
-                    # 데이터 크기 수신
-                    size_bytes = conn.recv(4)
-                    if not size_bytes:
-                        break
-                    (data_size,) = struct.unpack("<i", size_bytes)
-                    
-                    # 페이로드 수신
-                    payload = b""
-                    while len(payload) < data_size:
-                        chunk = conn.recv(data_size - len(payload))
-                        if not chunk:
-                            break
-                        payload += chunk
-                        
-                    text_data = payload.decode("utf-8", errors="replace")
-                    
-                    # JSON 파싱 및 토큰 추가
-                    try:
-                        obj = json.loads(text_data)
-                        token = obj.get("text", "").strip()
-                        print(f"[Received] {token}")
-                        if token:
-                            with self._tokens_lock:
-                                self.hypothesis_tokens.append(token)
-                            
-                            # 자막 서버로 전송
-                            if self.subtitle_client and self.subtitle_connected:
-                                self._forward_to_subtitle_server(text_data)
-                            # else:
-                            #     print("[Subtitle] 자막 서버에 연결되지 않음, 전송 생략")
-                            
-                    except json.JSONDecodeError:
-                        pass
-                        
-                    # 응답 전송
-                    resp_header = struct.pack("<ii", self.RESP_CHECKCODE, req_code)
-                    conn.sendall(resp_header + struct.pack("B", 0))
-                    
-            except Exception as e:
-                print(f"[Client Error] {e}")
+                # bytes를 그대로 파싱 (별도의 문자열 디코드 생략)
+                obj = _json_loads(payload)
+            except ValueError:
+                # 깨진 UTF-8이면 대체 문자로 바꿔서 다시 파싱
+                # (orjson은 UnicodeDecodeError 대신 JSONDecodeError를 냄)
+                fixed = payload.decode("utf-8", errors="replace").encode("utf-8")
+                if fixed == payload:
+                    raise
+                payload = fixed
+                obj = _json_loads(payload)
+            token = obj.get("text", "").strip()
+            print(f"[Received] {token}")
+            if token:
+                self.hypothesis_tokens.append(token)
+                self._hyp_generation += 1
+                self._request_update()
+                
+                # 자막 서버로 전송 (전송 스레드에 넘기고 바로 응답)
+                if self.subtitle_client and self.subtitle_connected:
+                    self._subtitle_queue.put(payload)
+                # else:
+                #     print("[Subtitle] 자막 서버에 연결되지 않음, 전송 생략")
+                
+        except json.JSONDecodeError:
+            pass
+            
+        # 응답은 송신 대기 버퍼에 쌓았다가 _read_client에서 한 번에 전송
+        # 헤더와 status를 한 번에 패킹 (중간 bytes 생성/이어 붙이기 없음)
+        client.outbuf += _RESPONSE.pack(self.RESP_CHECKCODE, req_code, _STATUS_OK)
+        
+    def _subtitle_loop(self):
+        """자막 전송 스레드 (자막 클라이언트는 이 스레드에서만 송신)"""
+        while True:
+            payload = self._subtitle_queue.get()
+            if payload is None:
+                return
+            self._forward_to_subtitle_server(payload)
     
-    def _forward_to_subtitle_server(self, text_data: str):
-        """자막 서버로 데이터 전송"""
+    def _forward_to_subtitle_server(self, payload: bytes):
+        """자막 서버로 데이터 전송 (수신한 UTF-8 본문을 그대로 중계)"""
         if not self.subtitle_client:
             return
             
@@ -265,52 +387,62 @@ class STTMonitorApp:
             self.subtitle_connected = self.subtitle_client.connect()
             if self.subtitle_connected:
                 # UI 업데이트는 메인 스레드에서
-                self.ui.root.after(0, lambda: self.ui.set_subtitle_status(
-                    f"자막 서버 재연결됨 ({self.SUBTITLE_HOST}:{self.SUBTITLE_PORT})", "green"))
+                self.ui.post(self.ui.set_subtitle_status,
+                             f"자막 서버 재연결됨 ({self.SUBTITLE_HOST}:{self.SUBTITLE_PORT})", "green")
             else:
                 return
         
         # 전송 시도
-        success = self.subtitle_client.send_subtitle(text_data)
+        success = self.subtitle_client.send_subtitle_bytes(payload.strip())
         if not success:
             self.subtitle_connected = False
             # UI 업데이트는 메인 스레드에서
-            self.ui.root.after(0, lambda: self.ui.set_subtitle_status(
-                f"자막 서버 연결 끊김", "red"))
+            self.ui.post(self.ui.set_subtitle_status, "자막 서버 연결 끊김", "red")
                 
-    def _schedule_update(self):
-        """500ms마다 UI 및 메트릭 갱신"""
-        if self.is_running:
-            self._update_display()
-            self.ui.schedule(500, self._schedule_update)
-            
+    def _request_update(self):
+        """
+        새 토큰 수신 시 UI 갱신 예약 (서버 스레드에서 호출)
+        이미 예약된 갱신이 있으면 건너뛰어, 연달아 들어온 토큰은 한 번의 갱신으로 처리
+        """
+        # 이미 완료됐으면 더 이상 갱신을 예약하지 않음
+        if self._update_pending or self.is_completed:
+            return
+        self._update_pending = True
+        self.ui.post(self._update_display)
+        
     def _update_display(self):
         """정렬 수행 및 UI 업데이트"""
+        # 이후 들어오는 토큰은 새 갱신을 예약하도록 플래그 해제
+        self._update_pending = False
+        
         # 이미 완료된 경우 더 이상 비교하지 않음
         if self.is_completed:
             return
             
-        with self._tokens_lock:
-            if not self.hypothesis_tokens:
-                return
-            hyp_text = " ".join(self.hypothesis_tokens)
+        # 직전 갱신 이후 새 토큰이 없으면 다시 계산하지 않음
+        generation = self._hyp_generation
+        if generation == self._rendered_generation:
+            return
+        self._rendered_generation = generation
+        
+        hyp_text = self._joined_hypothesis()
+        if not hyp_text:
+            return
         
         # 대본이 없으면 단순 출력 모드
         if not self.reference_text:
             self.ui.render_text(hyp_text, "hit")  # 초록색으로 출력
             return
             
-        # 정렬 및 메트릭 계산 (관대한 비교 모드)
-        aligned_tokens, metrics = compute_alignment(
+        # 정렬 및 메트릭 계산 (관대한 비교 모드, 직전 정렬 상태에서 이어서 계산)
+        aligned_tokens, metrics = self._aligner.update(
             self.reference_text, 
             hyp_text,
             similarity_threshold=self.SIMILARITY_THRESHOLD
         )
         
-        # 자막 완료 여부 체크 (PENDING이 없으면 완료)
-        has_pending = any(t.align_type == AlignType.PENDING for t in aligned_tokens)
-        
-        if not has_pending:
+        # 자막 완료 여부 체크 (PENDING이 없으면 완료, 정렬 중에 함께 계산된 값 사용)
+        if not metrics.has_pending:
             self.is_completed = True
             self.ui.set_status("✓ 자막 비교 완료!", "green")
         
@@ -318,11 +450,30 @@ class STTMonitorApp:
         self.ui.render_aligned_tokens(aligned_tokens)
         self.ui.update_metrics(metrics)
         
+    def _joined_hypothesis(self) -> str:
+        """지금까지 받은 토큰을 공백으로 이은 문자열 (새로 들어온 토큰만 꺼내 이어 붙임)"""
+        # 앞에서부터 꺼내므로 이미 붙인 토큰은 다시 훑지 않음 (새 토큰 수에 비례)
+        # popleft 도중에 서버 스레드가 추가한 토큰은 이번 또는 다음 갱신에 반영됨
+        tokens = self.hypothesis_tokens
+        popleft = tokens.popleft
+        new_tokens = [popleft() for _ in range(len(tokens))]
+        if new_tokens:
+            added = " ".join(new_tokens)
+            self._hyp_text = f"{self._hyp_text} {added}" if self._hyp_text else added
+        return self._hyp_text
+        
+    def _reset_hypothesis_cache(self):
+        """이어 붙인 hypothesis 캐시 초기화"""
+        self._rendered_generation = None
+        self._hyp_text = ""
+        
     def _on_closing(self):
         """종료 처리"""
         self.is_running = False
         if self.server_sock:
             self.server_sock.close()
+        # 자막 전송 스레드 종료
+        self._subtitle_queue.put(None)
         if self.subtitle_client:
             self.subtitle_client.disconnect()
 
@@ -17,14 +17,29 @@ import struct
 from typing import Optional, Callable
 import json
 
+try:
+    # 설치되어 있으면 더 빠른 orjson으로 직렬화 (UTF-8 bytes를 바로 반환)
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
 # 요청/응답 코드
 REQUEST_SUBTITLE = 0x01          # 자막 전송 요청 코드 (req/resp 공통)
 RESP_CHECKCODE   = 0x01350126    # 서버 응답용 체크코드 (int32 값)
 STATUS_OK        = 0             # 응답 status == 0 이면 성공
 
+# 패킷 포맷 (포맷 문자열은 모듈 로드 시 한 번만 해석)
+_HEADER = struct.Struct("<ii")   # [checkcode, request_code]
+_SIZE   = struct.Struct("<i")    # [data_size]
+_RESPONSE_SIZE = _HEADER.size + 1  # 응답 header(8B) + status(1B)
+
 StatusCallback = Callable[[str], None]
 
 
+def _noop_status(msg: str) -> None:
+    """status_cb 미지정 시 기본 콜백 (아무것도 하지 않음)"""
+
+
 class SubtitleClient:
     """
     자막 출력 서버와 '상시 연결'을 유지하면서
@@ -42,11 +57,19 @@ class SubtitleClient:
         port: int,
         checkcode: int,
         status_cb: Optional[StatusCallback] = None,
+        verbose: bool = False,
     ):
         self.host = host
         self.port = port
         self.checkcode = checkcode
-        self._status_cb = status_cb or (lambda msg: None)
+        # 요청 헤더는 매번 같으므로 미리 패킹
+        self._request_header = _HEADER.pack(checkcode, REQUEST_SUBTITLE)
+        self._status_cb = status_cb or _noop_status
+        # True면 전송 성공 로그도 출력 (기본은 연결/오류 로그만)
+        self._verbose = verbose
+        # 응답은 항상 9바이트이므로 수신 버퍼를 한 번만 할당해 재사용
+        self._resp_buf = bytearray(_RESPONSE_SIZE)
+        self._resp_view = memoryview(self._resp_buf)
 
         self._sock: Optional[socket.socket] = None
 
@@ -56,21 +79,21 @@ class SubtitleClient:
     def _log(self, msg: str) -> None:
         self._status_cb(f"[SUBTITLE] {msg}")
 
-    def _recv_exact(self, n: int) -> bytes:
+    def _recv_into(self, view: memoryview) -> None:
         """
-        내부 소켓에서 n 바이트를 정확히 읽어온다.
+        내부 소켓에서 view 크기만큼 정확히 읽어 view에 채운다.
         (끊기면 예외 발생)
         """
         if not self._sock:
             raise ConnectionError("socket is not connected")
 
-        buf = b""
-        while len(buf) < n:
-            chunk = self._sock.recv(n - len(buf))
-            if not chunk:
+        received = 0
+        size = len(view)
+        while received < size:
+            n = self._sock.recv_into(view[received:])
+            if not n:
                 raise ConnectionError("socket closed while receiving")
-            buf += chunk
-        return buf
+            received += n
 
     def _ensure_connection(self, timeout: float = 5.0) -> bool:
         """
@@ -84,6 +107,8 @@ class SubtitleClient:
             sock = socket.create_connection((self.host, self.port), timeout=timeout)
             # 읽기 타임아웃도 설정 (응답 대기 시 블록 방지)
             sock.settimeout(timeout)
+            # 작은 패킷을 바로 보내도록 Nagle 알고리즘 비활성화 (요청/응답 지연 방지)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             self._sock = sock
             self._log(f"connected to {self.host}:{self.port}")
             return True
@@ -132,26 +157,36 @@ class SubtitleClient:
             # 빈 문자열은 보내지 않음
             return False
 
+        return self.send_subtitle_bytes(text.encode(encoding))
+
+    def send_subtitle_bytes(self, text_bytes: bytes) -> bool:
+        """
+        이미 인코딩된 자막 바이트를 그대로 서버로 전송.
+        - 수신한 패킷 본문을 그대로 중계할 때 디코드/재인코딩을 생략하기 위함
+        - return: True면 정상 전송 + status == 0, False면 에러
+        """
+        if not text_bytes:
+            return False
+
         # 연결 보장
         if not self._ensure_connection():
             return False
 
         try:
             # 1) 패킷 구성 (Little Endian)
-            text_bytes = text.encode(encoding)
             size = len(text_bytes)
 
-            header = struct.pack("<ii", self.checkcode, REQUEST_SUBTITLE)
-            body = struct.pack("<i", size) + text_bytes
-            packet = header + body
+            # 헤더 + 크기 + 본문을 한 번의 복사로 이어 붙여 한 번에 전송
+            packet = b"".join((self._request_header, _SIZE.pack(size), text_bytes))
 
             # 2) 전송
             self._sock.sendall(packet)
 
-            # 3) 응답 수신
+            # 3) 응답 수신 (header + status를 미리 할당한 버퍼에 한 번에)
             #    - header(8B): [resp_checkcode, request_code]
-            resp_header = self._recv_exact(8)
-            resp_check, resp_code = struct.unpack("<ii", resp_header)
+            #    - body(1B): [status]
+            self._recv_into(self._resp_view)
+            resp_check, resp_code = _HEADER.unpack_from(self._resp_buf)
 
             if resp_check != RESP_CHECKCODE:
                 self._log(
@@ -167,15 +202,14 @@ class SubtitleClient:
                 )
                 return False
 
-            #    - body(1B): [status]
-            status_bytes = self._recv_exact(1)
-            status = status_bytes[0]
+            status = self._resp_buf[_HEADER.size]
 
             if status != STATUS_OK:
                 self._log(f"server returned error status={status}")
                 return False
 
-            self._log(f"subtitle sent OK (len={size})")
+            if self._verbose:
+                self._log(f"subtitle sent OK (len={size})")
             return True
 
         except Exception as e:
@@ -186,12 +220,17 @@ class SubtitleClient:
 
     def send_subtitle_json(self, payload: dict) -> bool:
         """
-        dict → JSON 직렬화 → send_subtitle() 호출
+        dict → JSON 직렬화 → send_subtitle_bytes() 호출
+        orjson 사용 시 int 등 str이 아닌 키도 json.dumps처럼 문자열로 변환
+        (NaN/Inf는 json.dumps와 달리 null로 직렬화됨)
         """
         try:
-            txt = json.dumps(payload, ensure_ascii=False)
+            if _orjson is not None:
+                data = _orjson.dumps(payload, option=_orjson.OPT_NON_STR_KEYS)
+            else:
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
         except Exception as e:
             self._log(f"json encoding error: {e}")
             return False
         
-        return self.send_subtitle(txt)
\ No newline at end of file
+        return self.send_subtitle_bytes(data)
\ No newline at end of file
@@ -31,6 +31,10 @@ _LOG_LOCK = threading.Lock()
 _LOG_PATH = Path(get_base_dir()) / "test_recv_debug.log"
 _SIGNAL_STOP = threading.Event()
 
+_HEADER = struct.Struct("<ii")
+_SIZE = struct.Struct("<i")
+_RESPONSE = struct.Struct("<iiB")
+
 
 def _log(message: str) -> None:
     line = f"[test_recv] {message}"
@@ -131,12 +135,12 @@ def _handle_subtitle_client(
             header = _recv_exact(conn, 8, stop_event)
             if not header:
                 break
-            _, req_code = struct.unpack("<ii", header)
+            _, req_code = _HEADER.unpack(header)
 
             size_raw = _recv_exact(conn, 4, stop_event)
             if not size_raw:
                 break
-            (size,) = struct.unpack("<i", size_raw)
+            (size,) = _SIZE.unpack(size_raw)
             if size < 0:
                 break
 
@@ -147,7 +151,7 @@ def _handle_subtitle_client(
             _print_payload(payload)
 
             try:
-                conn.sendall(struct.pack("<iiB", resp_checkcode, req_code, 0))
+                conn.sendall(_RESPONSE.pack(resp_checkcode, req_code, 0))
             except OSError:
                 break
     except OSError as exc:
@@ -8,12 +8,42 @@ date : 2026-01-13
 """
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext, messagebox
-from typing import Callable, Optional, List
+from typing import Callable, Dict, Iterable, Optional, List, Tuple
 
 from alignment import AlignedToken, AlignType, PartialMetrics
 
 from etc import resource_path
 
+# 아이콘 이미지 캐시 (경로별, 창을 다시 만들어도 PNG를 다시 디코드하지 않음)
+# 캐시가 이미지 참조를 계속 들고 있으므로 Tk 쪽 이미지가 GC로 사라지지도 않음
+_ICON_CACHE: Dict[str, tk.PhotoImage] = {}
+
+
+def _load_icon(root: tk.Tk, path: str) -> tk.PhotoImage:
+    img = _ICON_CACHE.get(path)
+    # 이미지는 만든 Tk 인터프리터에 묶이므로 root가 새로 만들어졌으면 다시 로드
+    if img is None or img.tk is not root.tk:
+        img = tk.PhotoImage(master=root, file=path)
+        _ICON_CACHE[path] = img
+    return img
+
+
+def _utf16_len(text: str) -> int:
+    """UTF-16 코드 단위 길이 (BMP 밖 문자는 2로 셈)"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _tk_len_func(root: tk.Tk) -> Callable[[str], int]:
+    """
+    Text 위젯 인덱스("+ N chars")와 같은 단위로 길이를 세는 함수 반환
+    Tcl/Tk 8.6은 BMP 밖 문자(이모지 등)를 서로게이트 쌍, 즉 2글자로 세므로
+    Python len()으로 계산한 위치를 그대로 쓰면 그만큼 앞쪽이 지워짐
+    """
+    if int(root.tk.call("string", "length", "\U0001F600")) == 2:
+        return _utf16_len
+    return len
+
+
 class MainWindow:
     """STT Live Monitor UI"""
     
@@ -26,6 +56,32 @@ class MainWindow:
         AlignType.INS: "#FFA500",      # 오렌지 (추가)
     }
     
+    # 범례 문구 (표시 순서대로)
+    LEGEND_LABELS = {
+        AlignType.PENDING: "⬚ 아직 안 읽음",
+        AlignType.HIT: "● 정답 ",
+        AlignType.SUB: "● 오인식 ",
+        AlignType.DEL: "● 누락 ",
+        AlignType.INS: "● 추가 ",
+    }
+    _LEGEND_STYLE = {"bg": "#2b2b2b", "font": ("Malgun Gothic", 7, "bold"), "padx": 10}
+    
+    # Text 태그 이름 (Enum .value 조회를 클래스 로드 시 한 번만 수행)
+    TAG_NAMES = {align_type: align_type.value for align_type in AlignType}
+    
+    # 정렬 토큰에 붙일 태그 목록
+    # 화면 내용은 대부분 HIT이므로 HIT는 태그 없이 위젯 기본 글자색(HIT 색)으로 표시해
+    # Text 위젯이 관리하는 태그 구간을 오류 토큰 수준으로 줄임
+    _TOKEN_TAGS = {align_type: (name,) for align_type, name in TAG_NAMES.items()}
+    _TOKEN_TAGS[AlignType.HIT] = ()
+    
+    # 토큰 앞뒤에 붙일 문자열 (삽입된 토큰은 대괄호로 표시)
+    _WRAP = {align_type: ("", " ") for align_type in AlignType}
+    _WRAP[AlignType.INS] = ("[", "] ")
+    
+    # 토큰/메트릭 갱신을 모아서 그리는 간격 (ms)
+    FLUSH_DELAY_MS = 40
+    
     def __init__(self, root: tk.Tk, appVersion: str):
         self.root = root
         self.root.title(f"STT Live Monitor {appVersion}")
@@ -39,8 +95,16 @@ class MainWindow:
         self._on_closing: Optional[Callable[[], None]] = None
         self._on_reconnect_subtitle: Optional[Callable[[], None]] = None
         
-        icon_path = resource_path("icon.png")
-        self.root.iconphoto(False, tk.PhotoImage(file=icon_path))
+        # 증분 렌더링 위치 계산용 길이 함수 (Tk 인덱스 단위)
+        self._tk_len = _tk_len_func(self.root)
+        self._reset_render_cache()
+        
+        # 그리기 대기 중인 최신 토큰/메트릭 (FLUSH_DELAY_MS 안의 갱신은 마지막 것만 반영)
+        self._dirty_tokens: Optional[Iterable[AlignedToken]] = None
+        self._dirty_metrics: Optional[PartialMetrics] = None
+        self._flush_scheduled = False
+        
+        self.root.iconphoto(False, _load_icon(self.root, resource_path("icon.png")))
         
         self._setup_ui()
         self._setup_tags()
@@ -58,28 +122,33 @@ class MainWindow:
         self.reset_btn.pack(side=tk.LEFT, padx=5)
 
         self.status_label = ttk.Label(top_frame, text="대기 중", foreground="gray")
+        # 현재 표시 중인 (문구, 색) - 같은 값이면 라벨 갱신 생략
+        self._status = ("대기 중", "gray")
         self.status_label.pack(side=tk.LEFT, padx=20)
 
         # --- 메트릭 표시 ---
         metric_frame = ttk.Frame(self.root, padding="5")
         metric_frame.pack(fill=tk.X, padx=10)
 
-        self.wer_var = tk.StringVar(value="Current WER: 0.00%")
-        self.cer_var = tk.StringVar(value="Global CER: 0.00%")
+        # 현재 표시 중인 문구 (문구가 바뀔 때만 라벨 갱신)
+        self._wer_text = "Current WER: 0.00%"
+        self._cer_text = "Global CER: 0.00%"
         
         lbl_style = {"font": ("Consolas", 10, "bold"), "background": "#2b2b2b"}
         
-        wer_lbl = tk.Label(metric_frame, textvariable=self.wer_var, fg="#ff6b6b", **lbl_style)
-        wer_lbl.pack(side=tk.LEFT, padx=10, fill=tk.Y)
+        # StringVar(trace) 없이 라벨 text를 직접 갱신
+        self.wer_lbl = tk.Label(metric_frame, text=self._wer_text, fg="#ff6b6b", **lbl_style)
+        self.wer_lbl.pack(side=tk.LEFT, padx=10, fill=tk.Y)
         
-        cer_lbl = tk.Label(metric_frame, textvariable=self.cer_var, fg="#51cf66", **lbl_style)
-        cer_lbl.pack(side=tk.LEFT, padx=10, fill=tk.Y)
+        self.cer_lbl = tk.Label(metric_frame, text=self._cer_text, fg="#51cf66", **lbl_style)
+        self.cer_lbl.pack(side=tk.LEFT, padx=10, fill=tk.Y)
         
         # --- 자막 서버 상태 표시 ---
         subtitle_frame = ttk.Frame(self.root, padding="5")
         subtitle_frame.pack(fill=tk.X, padx=10)
         
         self.subtitle_status_label = ttk.Label(subtitle_frame, text="자막 서버: 연결 대기", foreground="gray")
+        self._subtitle_status = ("자막 서버: 연결 대기", "gray")
         self.subtitle_status_label.pack(side=tk.LEFT, padx=5)
         
         self.reconnect_btn = ttk.Button(subtitle_frame, text="재연결", command=self._handle_reconnect_subtitle)
@@ -89,22 +158,13 @@ class MainWindow:
         legend_frame = ttk.LabelFrame(self.root, text="범례", padding="10")
         legend_frame.pack(fill=tk.X, padx=10, pady=5)
         
-        legend_items = [
-            (AlignType.PENDING, "white", "⬚ 아직 안 읽음"),
-            (AlignType.HIT, "#00FF00", "● 정답 "),
-            (AlignType.SUB, "#FF0000", "● 오인식 "),
-            (AlignType.DEL, "#FFFF00", "● 누락 "),
-            (AlignType.INS, "#FFA500", "● 추가 "),
-        ]
-        
-        for align_type, color, desc in legend_items:
+        # 색상은 TAG_COLORS를 그대로 사용 (범례와 본문 색이 어긋나지 않도록)
+        for align_type, desc in self.LEGEND_LABELS.items():
             lbl = tk.Label(
                 legend_frame, 
                 text=desc, 
-                fg=color, 
-                bg="#2b2b2b",
-                font=("Malgun Gothic", 7, "bold"),
-                padx=10
+                fg=self.TAG_COLORS[align_type], 
+                **self._LEGEND_STYLE
             )
             lbl.pack(side=tk.LEFT, padx=5)
 
@@ -114,7 +174,7 @@ class MainWindow:
             wrap=tk.WORD, 
             font=self.font_style, 
             bg="black", 
-            fg="white",
+            fg=self.TAG_COLORS[AlignType.HIT],  # 태그 없는 텍스트 = HIT
             state=tk.DISABLED,
             cursor="arrow",
             height=10  # 높이 제한 (약 절반)
@@ -126,7 +186,7 @@ class MainWindow:
     def _setup_tags(self):
         """텍스트 태그 설정"""
         for align_type, color in self.TAG_COLORS.items():
-            self.script_display.tag_config(align_type.value, foreground=color)
+            self.script_display.tag_config(self.TAG_NAMES[align_type], foreground=color)
     
     # --- 콜백 설정 ---
     def set_on_load_reference(self, callback: Callable[[], None]):
@@ -172,59 +232,169 @@ class MainWindow:
         messagebox.showerror(title, message)
         
     def set_status(self, text: str, color: str = "gray"):
+        status = (text, color)
+        if status == self._status:
+            return
+        self._status = status
         self.status_label.config(text=text, foreground=color)
         
     def set_subtitle_status(self, text: str, color: str = "gray"):
         """자막 서버 연결 상태 표시"""
+        status = (text, color)
+        if status == self._subtitle_status:
+            return
+        self._subtitle_status = status
         self.subtitle_status_label.config(text=text, foreground=color)
         
     def update_metrics(self, metrics: PartialMetrics):
-        """메트릭 UI 업데이트"""
-        self.wer_var.set(f"Current WER: {metrics.wer * 100:.2f}%")
-        self.cer_var.set(f"Global CER: {metrics.cer * 100:.2f}%")
+        """메트릭 UI 업데이트 예약"""
+        self._dirty_metrics = metrics
+        self._schedule_flush()
+        
+    def _do_update_metrics(self, metrics: PartialMetrics):
+        """메트릭 UI 업데이트 (표시 문구가 그대로면 라벨 갱신 생략)"""
+        # 문자열 생성은 저렴하고 비싼 쪽은 Tcl configure 호출이므로,
+        # 만든 문구를 표시 중인 문구와 비교해 다를 때만 갱신
+        wer_text = f"Current WER: {metrics.wer * 100:.2f}%"
+        if wer_text != self._wer_text:
+            self._wer_text = wer_text
+            self.wer_lbl.config(text=wer_text)
+        cer_text = f"Global CER: {metrics.cer * 100:.2f}%"
+        if cer_text != self._cer_text:
+            self._cer_text = cer_text
+            self.cer_lbl.config(text=cer_text)
         
     def reset_metrics(self):
         """메트릭 초기화"""
-        self.wer_var.set("Current WER: 0.00%")
-        self.cer_var.set("Global CER: 0.00%")
+        self._dirty_metrics = None
+        self._wer_text = "Current WER: 0.00%"
+        self._cer_text = "Global CER: 0.00%"
+        self.wer_lbl.config(text=self._wer_text)
+        self.cer_lbl.config(text=self._cer_text)
         
     def render_text(self, text: str, tag: str = "pending"):
         """단순 텍스트 렌더링 (초기 상태)"""
+        self._dirty_tokens = None
         self.script_display.config(state=tk.NORMAL)
-        self.script_display.delete("1.0", tk.END)
-        self.script_display.insert(tk.END, text, tag)
+        # delete + insert 대신 replace 한 번으로 처리 (Tcl 호출/화면 갱신 예약 1회)
+        self.script_display.replace("1.0", tk.END, text, tag)
         self.script_display.config(state=tk.DISABLED)
+        self._reset_render_cache()
         
     def clear_display(self):
         """화면 클리어"""
+        self._dirty_tokens = None
         self.script_display.config(state=tk.NORMAL)
         self.script_display.delete("1.0", tk.END)
         self.script_display.config(state=tk.DISABLED)
+        self._reset_render_cache()
         
-    def render_aligned_tokens(self, tokens: List[AlignedToken]):
-        """정렬된 토큰 렌더링 (PENDING 제외, 매칭된 것만 표시)"""
-        self.script_display.config(state=tk.NORMAL)
-        self.script_display.delete("1.0", tk.END)
+    def render_aligned_tokens(self, tokens: Iterable[AlignedToken]):
+        """정렬된 토큰 렌더링 예약"""
+        self._dirty_tokens = tokens
+        self._schedule_flush()
         
+    def _schedule_flush(self):
+        """대기 중인 갱신을 FLUSH_DELAY_MS 뒤에 한 번에 그리도록 예약"""
+        if self._flush_scheduled:
+            return
+        self._flush_scheduled = True
+        self.root.after(self.FLUSH_DELAY_MS, self._flush)
+        
+    def _flush(self):
+        """대기 중인 토큰/메트릭 갱신 반영"""
+        self._flush_scheduled = False
+        tokens, self._dirty_tokens = self._dirty_tokens, None
+        metrics, self._dirty_metrics = self._dirty_metrics, None
+        if tokens is not None:
+            self._do_render_aligned_tokens(tokens)
+        if metrics is not None:
+            self._do_update_metrics(metrics)
+        
+    def _do_render_aligned_tokens(self, tokens: Iterable[AlignedToken]):
+        """
+        정렬된 토큰 렌더링 (첫 PENDING 앞까지, 매칭된 것만 표시)
+        직전 렌더링 결과와 비교해 달라진 뒷부분만 지우고 다시 삽입
+        (STT가 진행될 때는 보통 마지막 몇 토큰만 바뀜)
+        """
+        parts = []  # (표시 문자열, 태그 목록)
+        # 루프 안 속성 조회를 줄이기 위한 지역 바인딩
+        append = parts.append
+        wrap = self._WRAP
+        token_tags = self._TOKEN_TAGS
+        pending = AlignType.PENDING
         for token in tokens:
-            # PENDING(아직 안 들어온 부분)은 표시하지 않음
-            if token.align_type == AlignType.PENDING:
-                continue
-                
-            if token.align_type == AlignType.INS:
-                # 삽입된 토큰은 대괄호로 표시
-                display_text = f"[{token.text}] "
-            else:
-                display_text = f"{token.text} "
+            align_type = token.align_type
+            # PENDING(아직 안 들어온 부분)부터는 표시하지 않음
+            # 처리 위치는 앞에서부터만 진행하므로 첫 PENDING 이후는 모두 읽기 전 부분
+            # (뒤쪽에 남은 문장부호 전용 토큰도 아직 읽지 않은 대본에 속함)
+            if align_type is pending:
+                break
             
-            self.script_display.insert(tk.END, display_text, token.align_type.value)
+            prefix, suffix = wrap[align_type]
+            append((prefix + token.text + suffix, token_tags[align_type]))
         
-        # 스크롤을 먼저 하고 DISABLED 설정
-        self.script_display.see(tk.END)
-        self.script_display.config(state=tk.DISABLED)
-        # DISABLED 상태에서도 동작하는 스크롤
-        self.script_display.yview_moveto(1.0)
+        # 직전 렌더링과 같은 앞부분 길이 (캐시가 없으면 전체를 다시 그림)
+        old_parts = self._rendered_parts
+        common = 0
+        if old_parts is not None:
+            limit = min(len(old_parts), len(parts))
+            while common < limit and old_parts[common] == parts[common]:
+                common += 1
+            if common == len(old_parts) == len(parts):
+                return
+        
+        # 바뀐 부분의 시작 문자 위치부터 새로 삽입할 인자 구성
+        # (위치는 Python len()이 아니라 Tk 인덱스 단위로 셈)
+        ends = self._rendered_ends
+        tk_len = self._tk_len
+        del ends[common:]
+        start = ends[-1] if ends else 0
+        offset = start
+        # insert는 "문자열 태그목록 문자열 태그목록 ..." 형태를 받으므로
+        # 토큰마다 insert하지 않고 인자를 모아 한 번에 호출 (Tcl 호출 1회)
+        # 태그가 같은 연속 토큰은 문자열 하나로 합쳐 인자 수와 태그 구간 수를 줄임
+        args = []
+        run_texts: List[str] = []
+        run_tags = None
+        for display_text, tags in parts[common:]:
+            offset += tk_len(display_text)
+            ends.append(offset)
+            if tags != run_tags:
+                if run_texts:
+                    args.append("".join(run_texts))
+                    args.append(run_tags)
+                run_texts = []
+                run_tags = tags
+            run_texts.append(display_text)
+        if run_texts:
+            args.append("".join(run_texts))
+            args.append(run_tags)
+        self._rendered_parts = parts
+        
+        display = self.script_display
+        # 수정하는 동안은 스크롤바 연결을 끊어 중간 스크롤바 갱신을 막고, 끝나면 다시 연결
+        yscroll = display.cget("yscrollcommand")
+        display.config(state=tk.NORMAL, yscrollcommand="")
+        if args:
+            display.replace(f"1.0 + {start} chars", tk.END, *args)
+        else:
+            display.delete(f"1.0 + {start} chars", tk.END)
+        
+        display.config(state=tk.DISABLED, yscrollcommand=yscroll)
+        # 맨 아래로 한 번만 스크롤 (DISABLED 상태에서도 동작, 다시 연결된 스크롤바도 이때 갱신됨)
+        display.yview_moveto(1.0)
+        
+    def _reset_render_cache(self):
+        """증분 렌더링용 캐시 초기화 (화면 내용을 통째로 바꿀 때 호출)"""
+        # 화면에 표시 중인 (표시 문자열, 태그 목록) 목록과 각 토큰의 끝 문자 위치 (Tk 인덱스 단위)
+        # (None이면 화면 내용을 알 수 없으므로 다음 렌더링에서 전체를 다시 그림)
+        self._rendered_parts: Optional[List[Tuple[str, Tuple[str, ...]]]] = None
+        self._rendered_ends: List[int] = []
         
-    def schedule(self, delay_ms: int, callback: Callable):
-        """주기적 작업 스케줄링"""
-        return self.root.after(delay_ms, callback)
\ No newline at end of file
+    def post(self, callback: Callable, *args):
+        """
+        UI 스레드에서 callback(*args) 실행 예약 (다른 스레드에서 호출해도 됨)
+        고정 타이머 대신 after_idle로, 대기 중인 화면 갱신이 끝난 뒤 실행됨
+        """
+        return self.root.after_idle(callback, *args)
\ No newline at end of file